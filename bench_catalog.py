@@ -0,0 +1,85 @@
+"""
+KITESTORE — замер памяти и скорости доступа к каталогу.
+
+Генерирует синтетический каталог (по умолчанию 50 000 товаров в схеме
+products.json) и сравнивает два представления:
+  • dict  — как json.load() отдаёт его хэндлерам;
+  • model — bot.Product/Size/Color после Product.from_dict().
+
+Память — tracemalloc после разбора (сам JSON-текст не учитывается),
+доступ — проход по всем товарам: базовая цена, число размеров и цветов.
+
+python bench_catalog.py
+python bench_catalog.py --count 100000 --repeat 5
+"""
+
+import argparse, json, os, random, shutil, sys, tempfile, time, tracemalloc
+from pathlib import Path
+
+def synthetic_catalog(count: int, categories: list, seed: int) -> list:
+    rnd   = random.Random(seed)
+    descs = [f"Описание модели {i}. " * 20 for i in range(200)]
+    return [{
+        "id": i, "name": f"Kite {i}", "category": rnd.choice(categories),
+        "price": 10_000 + i, "oldPrice": None if i % 2 else 20_000 + i,
+        "emoji": "🪁", "badge": rnd.choice([None, "ХИТ", "NEW", "-20%"]),
+        "desc": descs[i % len(descs)],
+        "tags": ["Фрирайд", "Профи", "2025"],
+        "colors": [{"name": "Синий", "value": "#0055ff"}, {"name": "Чёрный", "value": "#111111"}],
+        "sizes": [{"label": f"{s}м²", "priceDelta": d} for s, d in ((9, -10_000), (12, 0), (15, 12_000))],
+        "photos": [f"https://example.org/photos/{i}/0.jpg"],
+    } for i in range(count)]
+
+def measure(build, access, repeat: int):
+    tracemalloc.start()
+    data = build()
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    best = min(_timed(access, data) for _ in range(repeat))
+    return mem, best, data
+
+def _timed(access, data) -> float:
+    t = time.perf_counter()
+    access(data)
+    return time.perf_counter() - t
+
+def dict_access(products):
+    for p in products:
+        min(p['price'] + s.get('priceDelta', 0) for s in p['sizes']) if p.get('sizes') else p['price']
+        len(p.get('sizes', [])), len(p.get('colors', []))
+
+def model_access(products):
+    for p in products:
+        p.base_price, len(p.sizes), len(p.colors)
+
+def main():
+    ap = argparse.ArgumentParser(description="Замер каталога: dict против bot.Product")
+    ap.add_argument("--count",  type=int, default=50_000, help="товаров в синтетическом каталоге")
+    ap.add_argument("--repeat", type=int, default=3,      help="повторов прохода, берётся лучший")
+    ap.add_argument("--seed",   type=int, default=1)
+    args = ap.parse_args()
+
+    # импорт bot создаёт photos/ и читает sales.json в cwd — уходим во временную папку
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    cwd, workdir = os.getcwd(), tempfile.mkdtemp(prefix="kitestore_bench_")
+    os.chdir(workdir)
+    try:
+        import bot
+        text = json.dumps(synthetic_catalog(args.count, list(bot.CATEGORIES), args.seed), ensure_ascii=False)
+
+        d_mem, d_time, dicts  = measure(lambda: json.loads(text), dict_access, args.repeat)
+        m_mem, m_time, models = measure(lambda: [bot.Product.from_dict(d) for d in json.loads(text)],
+                                        model_access, args.repeat)
+        assert [p.to_dict() for p in models] == dicts, "round-trip не совпал"
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    mib = lambda b: f"{b / 2**20:8.1f} MiB"
+    print(f"\n🪁 Каталог: {args.count} товаров")
+    print(f"   dict   {mib(d_mem)}   проход {d_time * 1000:8.1f} ms")
+    print(f"   model  {mib(m_mem)}   проход {m_time * 1000:8.1f} ms")
+    print(f"   память ×{d_mem / m_mem:.1f} меньше, доступ ×{d_time / m_time:.1f} быстрее")
+
+if __name__ == "__main__":
+    main()
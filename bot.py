@@ -6,11 +6,13 @@ pip install python-telegram-bot
 python bot.py
 """
 
-import logging, json, os, shutil, asyncio
+import logging, json, os, re, sys, shutil, asyncio, heapq
+from datetime import datetime, timedelta
 from pathlib import Path
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram.helpers import escape_markdown
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler,
+    Application, CommandHandler, MessageHandler, TypeHandler,
     CallbackQueryHandler, ConversationHandler, filters, ContextTypes
 )
 
@@ -25,6 +27,13 @@ ADMIN_CHAT_ID     = int(os.environ.get("ADMIN_CHAT_ID", "123456789"))
 PUBLIC_PHOTOS_URL = os.environ.get("PUBLIC_PHOTOS_URL", "https://your-login.github.io/kitestore/photos")
 PRODUCTS_FILE     = "products.json"
 PHOTOS_DIR        = Path("photos")
+# Запись входящих апдейтов в JSONL для replay.py (пусто — выключено).
+# ⚠️ В лог попадают имена, username и данные заказов (web_app_data,
+# в т.ч. телефоны покупателей) — только для отладки, не в продакшене.
+UPDATES_LOG_FILE  = os.environ.get("UPDATES_LOG_FILE",  "")
+# Снимок аналитики продаж и как часто его сохранять (сек)
+SALES_FILE        = os.environ.get("SALES_FILE",        "sales.json")
+SALES_SNAPSHOT_SEC = int(os.environ.get("SALES_SNAPSHOT_SEC", "60"))
 # ═══════════════════════════════════════════
 
 logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
@@ -50,19 +59,247 @@ CATEGORIES = {
 #  ХРАНИЛИЩЕ
 # ═══════════════════════════════════════════
 
+# ── Модель каталога ───────────────────────
+# Один проход разбора/проверки схемы products.json; дальше по коду
+# ходят только типизированные объекты со __slots__.
+
+NO_VALUES = ("нет", "no", "-", "")
+
+def parse_price(text) -> int:
+    """'24 000' / '24,000' / 24000 -> 24000; ValueError если не число"""
+    if isinstance(text, bool):
+        raise ValueError(f"цена должна быть числом: {text!r}")
+    if isinstance(text, int):
+        return text
+    return int(str(text).strip().replace(" ", "").replace("\u00a0", "").replace(",", ""))
+
+def _str(v, what) -> str:
+    if not isinstance(v, str):
+        raise ValueError(f"{what}: ожидается строка, получено {v!r}")
+    return v
+
+def _opt_str(v, what):
+    return None if v is None else _str(v, what)
+
+def _list(v, what) -> list:
+    if v is None:
+        return []
+    if not isinstance(v, list):
+        raise ValueError(f"{what}: ожидается список, получено {type(v).__name__}")
+    return v
+
+
+class Color:
+    __slots__ = ("name", "value")
+
+    def __init__(self, name: str, value: str):
+        self.name  = sys.intern(name)
+        self.value = sys.intern(value)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Color":
+        if not isinstance(d, dict):
+            raise ValueError(f"цвет: ожидается объект, получено {d!r}")
+        return cls(_str(d.get("name"), "colors.name"), _str(d.get("value"), "colors.value"))
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "value": self.value}
+
+
+class Size:
+    __slots__ = ("label", "price_delta")
+
+    def __init__(self, label: str, price_delta: int = 0):
+        self.label       = sys.intern(label)
+        self.price_delta = price_delta
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Size":
+        if not isinstance(d, dict):
+            raise ValueError(f"размер: ожидается объект, получено {d!r}")
+        return cls(_str(d.get("label"), "sizes.label"), parse_price(d.get("priceDelta", 0)))
+
+    def to_dict(self) -> dict:
+        return {"label": self.label, "priceDelta": self.price_delta}
+
+
+def _intern_tuple(v) -> tuple:
+    return tuple(sys.intern(t) for t in v)
+
+def _opt_intern(v):
+    return None if v is None else sys.intern(v)
+
+def _pid(v) -> int:
+    if not isinstance(v, int) or isinstance(v, bool):
+        raise ValueError(f"некорректный id {v!r}")
+    return v
+
+
+class Product:
+    __slots__ = ("id", "name", "category", "price", "old_price", "emoji",
+                 "badge", "desc", "tags", "colors", "sizes", "photos")
+
+    # ключ в products.json -> (атрибут, разбор значения из JSON)
+    FIELDS = {
+        "id":       ("id",        _pid),
+        "name":     ("name",      lambda v: _str(v, "name")),
+        "category": ("category",  lambda v: _str(v, "category")),
+        "price":    ("price",     parse_price),
+        "oldPrice": ("old_price", lambda v: None if v is None else parse_price(v)),
+        "emoji":    ("emoji",     lambda v: "🪁" if v is None else _str(v, "emoji")),
+        "badge":    ("badge",     lambda v: _opt_str(v, "badge")),
+        "desc":     ("desc",      lambda v: "" if v is None else _str(v, "desc")),
+        "tags":     ("tags",      lambda v: [_str(t, "tags") for t in _list(v, "tags")]),
+        "colors":   ("colors",    lambda v: [Color.from_dict(c) for c in _list(v, "colors")]),
+        "sizes":    ("sizes",     lambda v: [Size.from_dict(s) for s in _list(v, "sizes")]),
+        "photos":   ("photos",    lambda v: [_str(u, "photos") for u in _list(v, "photos")]),
+    }
+
+    # Приведение при любом присваивании — и при загрузке, и из хэндлеров.
+    # Строки интернируются: категории, бейджи, теги и описания у вариаций
+    # одной модели повторяются и хранятся в одном экземпляре.
+    _NORMALIZE = {
+        "name":     sys.intern,
+        "category": sys.intern,
+        "emoji":    sys.intern,
+        "badge":    _opt_intern,
+        "desc":     sys.intern,
+        "tags":     _intern_tuple,
+        "colors":   tuple,
+        "sizes":    tuple,
+        "photos":   tuple,
+    }
+
+    def __init__(self, id=None, name="", category="", price=0, old_price=None,
+                 emoji="🪁", badge=None, desc="", tags=(), colors=(), sizes=(), photos=()):
+        self.id        = id
+        self.name      = name
+        self.category  = category
+        self.price     = price
+        self.old_price = old_price
+        self.emoji     = emoji
+        self.badge     = badge
+        self.desc      = desc
+        self.tags      = tags
+        self.colors    = colors
+        self.sizes     = sizes
+        self.photos    = photos
+
+    def __setattr__(self, attr, value):
+        norm = self._NORMALIZE.get(attr)
+        object.__setattr__(self, attr, norm(value) if norm else value)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Product":
+        if not isinstance(d, dict):
+            raise ValueError(f"товар: ожидается объект, получено {type(d).__name__}")
+        try:
+            return cls(**{attr: decode(d.get(key)) for key, (attr, decode) in cls.FIELDS.items()})
+        except ValueError as e:
+            raise ValueError(f"товар ID:{d.get('id')!r}: {e}") from None
+
+    def to_dict(self) -> dict:
+        d = {}
+        for key, (attr, _) in self.FIELDS.items():
+            v = getattr(self, attr)
+            if isinstance(v, tuple):
+                v = [x.to_dict() if isinstance(x, (Color, Size)) else x for x in v]
+            d[key] = v
+        return d
+
+    @property
+    def base_price(self) -> int:
+        if self.sizes:
+            return self.price + min(s.price_delta for s in self.sizes)
+        return self.price
+
+    @property
+    def price_range(self) -> tuple:
+        if self.sizes:
+            deltas = [s.price_delta for s in self.sizes]
+            return self.price + min(deltas), self.price + max(deltas)
+        return self.price, self.price
+
+    @property
+    def category_label(self) -> str:
+        return CATEGORIES.get(self.category, self.category)
+
+
+def parse_tags(text: str) -> list:
+    return [t.strip() for t in text.split(",") if t.strip()]
+
+def parse_colors(lines) -> list:
+    """Строки вида `Синий #1a5fe8`; неподходящие пропускаются"""
+    colors = []
+    for line in lines:
+        parts = line.strip().rsplit(' ', 1)
+        if len(parts) == 2 and parts[1].startswith('#'):
+            colors.append(Color(parts[0].strip(), parts[1].strip()))
+    return colors
+
+# Дельта — последнее слово строки. Разряды через пробел допускаются
+# только у дельты со знаком (`+12 000`) или через неразрывный пробел:
+# в метках размеров уже есть пробелы и числа (`141/ 42`).
+_SIGNED_GROUPED = re.compile(r"^(.*?)\s+([+-]\d{1,3}(?: \d{3})+)$")
+
+def parse_sizes(lines) -> list:
+    """Строки вида `12м² +12000`; неподходящие пропускаются
+
+    >>> [(s.label, s.price_delta) for s in parse_sizes(["141/ 42 500", "12м² +12 000", "Размер 40 500"])]
+    [('141/ 42', 500), ('12м²', 12000), ('Размер 40', 500)]
+    """
+    sizes = []
+    for line in lines:
+        line = line.strip()
+        m = _SIGNED_GROUPED.match(line)
+        parts = [m.group(1), m.group(2)] if m else line.rsplit(' ', 1)
+        if len(parts) == 2:
+            try: sizes.append(Size(parts[0].strip(), parse_price(parts[1].replace('+',''))))
+            except ValueError: pass
+    return sizes
+
+# ── Файл каталога ─────────────────────────
+# Разобранный каталог кэшируется до изменения файла на диске.
+_catalog_cache = {"mtime": None, "products": [], "by_id": {}}
+
 def load_products() -> list:
     if not os.path.exists(PRODUCTS_FILE):
         save_products([])
-        return []
-    with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+        return _catalog_cache["products"]
+    mtime = os.stat(PRODUCTS_FILE).st_mtime_ns
+    if _catalog_cache["mtime"] != mtime:
+        with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        _catalog_cache["products"] = [Product.from_dict(d) for d in _list(raw, "products.json")]
+        _catalog_cache["by_id"] = {p.id: p for p in _catalog_cache["products"]}
+        _catalog_cache["mtime"] = mtime
+    return _catalog_cache["products"]
 
 def save_products(products: list):
-    with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(products, f, ensure_ascii=False, indent=2)
+    # пишем через tmp + os.replace, чтобы не оставить обрезанный файл
+    tmp = PRODUCTS_FILE + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([p.to_dict() for p in products], f, ensure_ascii=False, indent=2)
+        os.replace(tmp, PRODUCTS_FILE)
+    except Exception:
+        # хэндлеры правят объекты из кэша до сохранения — сбрасываем его,
+        # следующий load_products() перечитает то, что реально на диске
+        _catalog_cache["mtime"] = None
+        raise
+    _catalog_cache["products"] = products
+    _catalog_cache["by_id"] = {p.id: p for p in products}
+    _catalog_cache["mtime"] = os.stat(PRODUCTS_FILE).st_mtime_ns
 
 def next_id(products):
-    return max((p["id"] for p in products), default=0) + 1
+    return max((p.id for p in products), default=0) + 1
+
+def find_product(products, pid):
+    return next((p for p in products if p.id == pid), None)
+
+def product_by_id(pid):
+    load_products()
+    return _catalog_cache["by_id"].get(pid)
 
 def is_admin(update: Update):
     return update.effective_user.id == ADMIN_CHAT_ID
@@ -104,6 +341,7 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("📋 Список товаров",  callback_data="admin_list_0")],
         [InlineKeyboardButton("✏️ Редактировать",   callback_data="admin_edit_choose")],
         [InlineKeyboardButton("🗑 Удалить товар",   callback_data="admin_del_choose")],
+        [InlineKeyboardButton("📊 Отчёт по продажам", callback_data="admin_report")],
         [InlineKeyboardButton("🔙 В главное меню",  callback_data="back_start")],
     ]
     markup = InlineKeyboardMarkup(kb)
@@ -131,13 +369,12 @@ async def admin_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     lines = []
     for p in chunk:
-        base = _base_price(p)
-        sizes_str = f"{len(p.get('sizes',[]))} р-ров" if p.get('sizes') else "—"
-        colors_str = f"{len(p.get('colors',[]))} цвета" if p.get('colors') else "—"
-        photos_str = f"📸 {len(p.get('photos',[]))}" if p.get('photos') else "📷 нет фото"
+        sizes_str = f"{len(p.sizes)} р-ров" if p.sizes else "—"
+        colors_str = f"{len(p.colors)} цвета" if p.colors else "—"
+        photos_str = f"📸 {len(p.photos)}" if p.photos else "📷 нет фото"
         lines.append(
-            f"{p.get('emoji','🪁')} *{p['name']}*  `ID:{p['id']}`\n"
-            f"   💰 {base:,} ₽  •  {CATEGORIES.get(p['category'],p['category'])}\n"
+            f"{p.emoji} *{p.name}*  `ID:{p.id}`\n"
+            f"   💰 {p.base_price:,} ₽  •  {p.category_label}\n"
             f"   {photos_str}  •  {sizes_str}  •  {colors_str}"
         )
     nav = []
@@ -151,18 +388,14 @@ async def admin_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb)
     )
 
-def _base_price(p):
-    if p.get('sizes'):
-        return min(p['price'] + (s.get('priceDelta',0)) for s in p['sizes'])
-    return p['price']
-
 # ═══════════════════════════════════════════
 #  ДОБАВЛЕНИЕ ТОВАРА
 # ═══════════════════════════════════════════
 
 async def add_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
-    context.user_data['np'] = {'photos': [], 'colors': [], 'sizes': []}
+    context.user_data['np'] = Product()
+    context.user_data.pop('np_tmp_id', None)
     await q.edit_message_text(
         "➕ *Новый товар — шаг 1/9*\n\n"
         "Введите *название* товара:\n\n_/cancel — отменить_",
@@ -171,13 +404,13 @@ async def add_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ADD_NAME
 
 async def add_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['np']['name'] = update.message.text.strip()
+    context.user_data['np'].name = update.message.text.strip()
     await update.message.reply_text("Шаг 2/9 — Введите *базовую цену* (₽, только цифры):", parse_mode="Markdown")
     return ADD_PRICE
 
 async def add_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        context.user_data['np']['price'] = int(update.message.text.strip().replace(" ","").replace(",",""))
+        context.user_data['np'].price = parse_price(update.message.text)
     except ValueError:
         await update.message.reply_text("⚠️ Только цифры! Повторите:"); return ADD_PRICE
     await update.message.reply_text("Шаг 3/9 — Введите *старую цену* (для зачёркивания) или `нет`:", parse_mode="Markdown")
@@ -185,10 +418,10 @@ async def add_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def add_old_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
     v = update.message.text.strip().lower()
-    if v in ("нет","no","-",""):
-        context.user_data['np']['oldPrice'] = None
+    if v in NO_VALUES:
+        context.user_data['np'].old_price = None
     else:
-        try: context.user_data['np']['oldPrice'] = int(v.replace(" ","").replace(",",""))
+        try: context.user_data['np'].old_price = parse_price(v)
         except ValueError:
             await update.message.reply_text("⚠️ Цифры или 'нет':"); return ADD_OLD_PRICE
     kb = [[InlineKeyboardButton(l, callback_data=f"cat_{k}")] for k,l in CATEGORIES.items()]
@@ -198,28 +431,28 @@ async def add_old_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def add_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
-    context.user_data['np']['category'] = q.data.replace("cat_","")
+    context.user_data['np'].category = q.data.replace("cat_","")
     await q.edit_message_text("Шаг 5/9 — Введите *бейдж* на карточке (ХИТ, NEW, -20% …) или `нет`:", parse_mode="Markdown")
     return ADD_BADGE
 
 async def add_badge(update: Update, context: ContextTypes.DEFAULT_TYPE):
     v = update.message.text.strip()
-    context.user_data['np']['badge'] = None if v.lower() in ("нет","no","-","") else v
-    context.user_data['np']['emoji'] = "🪁"  # дефолт
+    context.user_data['np'].badge = None if v.lower() in NO_VALUES else v
     await update.message.reply_text("Шаг 6/9 — Введите *описание* товара:", parse_mode="Markdown")
     return ADD_DESC
 
 async def add_desc(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['np']['desc'] = update.message.text.strip()
+    context.user_data['np'].desc = update.message.text.strip()
     await update.message.reply_text("Шаг 7/9 — Введите *теги* через запятую:\nПример: `Фрирайд, Профи, 3-strut`", parse_mode="Markdown")
     return ADD_TAGS
 
 async def add_tags(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['np']['tags'] = [t.strip() for t in update.message.text.split(",") if t.strip()]
+    context.user_data['np'].tags = parse_tags(update.message.text)
     await update.message.reply_text(
         "Шаг 8/9 — Добавьте *цвета и размеры с ценами*.\n\n"
         "📌 *Формат цветов* (по одному на строку):\n`Синий #1a5fe8`\n`Красный #cc0000`\n\n"
-        "📌 *Формат размеров* (по одному на строку):\n`9м² -10000` (отрицательная дельта)\n`12м² 0` (базовая цена)\n`15м² +12000`\n\n"
+        "📌 *Формат размеров* (по одному на строку):\n`9м² -10000` (отрицательная дельта)\n`12м² 0` (базовая цена)\n`15м² +12000`\n"
+        "_Дельта — последнее число в строке; с разрядами пишите со знаком: `+12 000`_\n\n"
         "Пример сообщения:\n```\nЦВЕТА:\nСиний #0055ff\nЧёрный #111111\n\nРАЗМЕРЫ:\n9м² -10000\n12м² 0\n15м² 12000\n```\n\n"
         "_Если нет вариантов — напишите `нет`_",
         parse_mode="Markdown"
@@ -232,24 +465,16 @@ async def add_colors_sizes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     np = context.user_data['np']
 
     if text.lower() != "нет":
-        lines = text.split('\n')
+        sections = {'colors': [], 'sizes': []}
         mode = None
-        for line in lines:
+        for line in text.split('\n'):
             line = line.strip()
             if not line: continue
             if 'ЦВЕТА' in line.upper() or 'COLORS' in line.upper(): mode = 'colors'; continue
             if 'РАЗМЕРЫ' in line.upper() or 'SIZES' in line.upper(): mode = 'sizes'; continue
-            if mode == 'colors':
-                parts = line.rsplit(' ', 1)
-                if len(parts) == 2 and parts[1].startswith('#'):
-                    np['colors'].append({'name': parts[0].strip(), 'value': parts[1].strip()})
-            elif mode == 'sizes':
-                parts = line.rsplit(' ', 1)
-                if len(parts) == 2:
-                    try:
-                        delta = int(parts[1].replace('+',''))
-                        np['sizes'].append({'label': parts[0].strip(), 'priceDelta': delta})
-                    except ValueError: pass
+            if mode: sections[mode].append(line)
+        np.colors = np.colors + tuple(parse_colors(sections['colors']))
+        np.sizes  = np.sizes + tuple(parse_sizes(sections['sizes']))
 
     await update.message.reply_text(
         "Шаг 9/9 — Отправьте *фотографии* товара (можно несколько).\n\n"
@@ -267,19 +492,19 @@ async def add_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     file = await context.bot.get_file(photo.file_id)
 
     # Создаём временный ID если ещё нет
-    if 'tmp_id' not in np:
-        np['tmp_id'] = f"tmp_{update.message.message_id}"
-    pid = np['tmp_id']
+    if 'np_tmp_id' not in context.user_data:
+        context.user_data['np_tmp_id'] = f"tmp_{update.message.message_id}"
+    pid = context.user_data['np_tmp_id']
     photo_dir = PHOTOS_DIR / str(pid)
     photo_dir.mkdir(exist_ok=True)
 
-    idx = len(np['photos'])
+    idx = len(np.photos)
     filename = f"{idx}.jpg"
     filepath = photo_dir / filename
     await file.download_to_drive(filepath)
 
     photo_url = f"{PUBLIC_PHOTOS_URL}/{pid}/{filename}"
-    np['photos'].append(photo_url)
+    np.photos = np.photos + (photo_url,)
 
     await update.message.reply_text(
         f"📸 Фото {idx+1} добавлено!\n_Отправьте ещё или нажмите Готово._",
@@ -292,38 +517,36 @@ async def photos_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
     np = context.user_data['np']
     products = load_products()
-    np['id'] = next_id(products)
+    np.id = next_id(products)
     # Переименовать папку фото с реальным ID
-    if 'tmp_id' in np:
-        old_dir = PHOTOS_DIR / np['tmp_id']
-        new_dir = PHOTOS_DIR / str(np['id'])
+    tmp_id = context.user_data.pop('np_tmp_id', None)
+    if tmp_id:
+        old_dir = PHOTOS_DIR / tmp_id
+        new_dir = PHOTOS_DIR / str(np.id)
         if old_dir.exists():
             shutil.move(str(old_dir), str(new_dir))
             # Обновить URL фото
-            np['photos'] = [url.replace(np['tmp_id'], str(np['id'])) for url in np['photos']]
-        del np['tmp_id']
+            np.photos = [url.replace(tmp_id, str(np.id)) for url in np.photos]
 
     products.append(np)
     save_products(products)
 
-    price_info = f"{np['price']:,} ₽"
-    if np.get('sizes'):
-        prices = [np['price'] + s.get('priceDelta',0) for s in np['sizes']]
-        price_info = f"{min(prices):,}–{max(prices):,} ₽"
+    lo, hi = np.price_range
+    price_info = f"{lo:,} ₽" if lo == hi else f"{lo:,}–{hi:,} ₽"
 
-    sizes_str  = ", ".join(s['label'] for s in np.get('sizes',[])) or "нет"
-    colors_str = ", ".join(c['name'] for c in np.get('colors',[])) or "нет"
-    photos_str = f"{len(np['photos'])} фото" if np.get('photos') else "нет фото"
+    sizes_str  = ", ".join(s.label for s in np.sizes) or "нет"
+    colors_str = ", ".join(c.name for c in np.colors) or "нет"
+    photos_str = f"{len(np.photos)} фото" if np.photos else "нет фото"
 
     await q.edit_message_text(
         f"✅ *Товар добавлен!*\n\n"
-        f"{np.get('emoji','🪁')} *{np['name']}*\n"
+        f"{np.emoji} *{np.name}*\n"
         f"💰 {price_info}\n"
-        f"🏷 {CATEGORIES.get(np['category'],np['category'])}\n"
+        f"🏷 {np.category_label}\n"
         f"📐 Размеры: {sizes_str}\n"
         f"🎨 Цвета: {colors_str}\n"
         f"📸 Фото: {photos_str}\n"
-        f"🆔 ID: `{np['id']}`",
+        f"🆔 ID: `{np.id}`",
         parse_mode="Markdown",
         reply_markup=_back_admin()
     )
@@ -344,8 +567,8 @@ async def del_choose(update: Update, context: ContextTypes.DEFAULT_TYPE):
     products = load_products()
     if not products:
         await q.edit_message_text("📭 Каталог пуст.", reply_markup=_back_admin()); return
-    kb = [[InlineKeyboardButton(f"{p.get('emoji','🪁')} {p['name']} ({_base_price(p):,}₽)",
-                                callback_data=f"del_cf_{p['id']}")] for p in products]
+    kb = [[InlineKeyboardButton(f"{p.emoji} {p.name} ({p.base_price:,}₽)",
+                                callback_data=f"del_cf_{p.id}")] for p in products]
     kb.append([InlineKeyboardButton("🔙 Назад", callback_data="admin_panel")])
     await q.edit_message_text("🗑 Выберите товар для удаления:", parse_mode="Markdown",
                               reply_markup=InlineKeyboardMarkup(kb))
@@ -354,25 +577,25 @@ async def del_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
     pid = int(q.data.split("_")[-1])
     products = load_products()
-    p = next((x for x in products if x['id']==pid), None)
+    p = find_product(products, pid)
     if not p:
         await q.edit_message_text("⚠️ Не найден.", reply_markup=_back_admin()); return
     kb = [[InlineKeyboardButton("✅ Да, удалить", callback_data=f"del_do_{pid}"),
            InlineKeyboardButton("❌ Отмена",       callback_data="admin_panel")]]
-    await q.edit_message_text(f"🗑 Удалить *{p['name']}*?\n\nЭто действие необратимо.",
+    await q.edit_message_text(f"🗑 Удалить *{p.name}*?\n\nЭто действие необратимо.",
                               parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
 
 async def del_do(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
     pid = int(q.data.split("_")[-1])
     products = load_products()
-    p = next((x for x in products if x['id']==pid), None)
-    name = p['name'] if p else str(pid)
+    p = find_product(products, pid)
+    name = p.name if p else str(pid)
     # Удалить папку с фото
     photo_dir = PHOTOS_DIR / str(pid)
     if photo_dir.exists():
         shutil.rmtree(str(photo_dir))
-    products = [x for x in products if x['id']!=pid]
+    products = [x for x in products if x.id != pid]
     save_products(products)
     await q.edit_message_text(f"✅ Товар *{name}* удалён.\nОсталось: {len(products)}",
                               parse_mode="Markdown", reply_markup=_back_admin())
@@ -397,8 +620,8 @@ async def edit_choose(update: Update, context: ContextTypes.DEFAULT_TYPE):
     products = load_products()
     if not products:
         await q.edit_message_text("📭 Каталог пуст.", reply_markup=_back_admin()); return
-    kb = [[InlineKeyboardButton(f"{p.get('emoji','🪁')} {p['name']}",
-                                callback_data=f"edit_p_{p['id']}")] for p in products]
+    kb = [[InlineKeyboardButton(f"{p.emoji} {p.name}",
+                                callback_data=f"edit_p_{p.id}")] for p in products]
     kb.append([InlineKeyboardButton("🔙 Назад", callback_data="admin_panel")])
     await q.edit_message_text("✏️ Выберите товар:", parse_mode="Markdown",
                               reply_markup=InlineKeyboardMarkup(kb))
@@ -408,14 +631,14 @@ async def edit_field_choose(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pid = int(q.data.split("_")[-1])
     context.user_data['edit_id'] = pid
     products = load_products()
-    p = next((x for x in products if x['id']==pid), None)
+    p = find_product(products, pid)
     if not p:
         await q.edit_message_text("⚠️ Не найден.", reply_markup=_back_admin()); return
     kb = [[InlineKeyboardButton(label, callback_data=f"ef_{key}")] for key, label in EDIT_FIELDS.items()]
     kb.append([InlineKeyboardButton("📸 Обновить фото", callback_data=f"edit_photos_{pid}")])
     kb.append([InlineKeyboardButton("🔙 Назад", callback_data="admin_edit_choose")])
     await q.edit_message_text(
-        f"✏️ *{p['name']}*\n\nЧто изменить?",
+        f"✏️ *{p.name}*\n\nЧто изменить?",
         parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb)
     )
     return EDIT_CHOOSE_FIELD
@@ -427,7 +650,7 @@ async def edit_field_ask(update: Update, context: ContextTypes.DEFAULT_TYPE):
     label = EDIT_FIELDS.get(field, field)
     hints = {
         "colors": "Пример:\n`Синий #0055ff`\n`Красный #cc0000`",
-        "sizes":  "Пример:\n`9м² -10000`\n`12м² 0`\n`15м² 12000`",
+        "sizes":  "Пример:\n`9м² -10000`\n`12м² 0`\n`15м² +12 000`\n\n_Дельта — последнее число в строке; с разрядами — только со знаком_",
         "tags":   "Пример: `Фрирайд, Профи, LEI`",
     }
     hint = hints.get(field, "")
@@ -442,41 +665,32 @@ async def edit_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     field = context.user_data.get('edit_field')
     value = update.message.text.strip()
     products = load_products()
-    p = next((x for x in products if x['id']==pid), None)
+    p = find_product(products, pid)
     if not p:
         await update.message.reply_text("⚠️ Товар не найден.")
         return ConversationHandler.END
 
-    if field == 'price':
-        try: value = int(value.replace(" ","").replace(",",""))
-        except: await update.message.reply_text("⚠️ Только цифры."); return EDIT_VALUE
-    elif field == 'oldPrice':
-        value = None if value.lower() in ("нет","no","-","") else int(value.replace(" ","").replace(",",""))
+    try:
+        if field == 'price':
+            value = parse_price(value)
+        elif field == 'oldPrice':
+            value = None if value.lower() in NO_VALUES else parse_price(value)
+    except ValueError:
+        await update.message.reply_text("⚠️ Только цифры."); return EDIT_VALUE
+    if field == 'badge':
+        value = None if value.lower() in NO_VALUES else value
     elif field == 'tags':
-        value = [t.strip() for t in value.split(",") if t.strip()]
+        value = parse_tags(value)
     elif field == 'colors':
-        colors = []
-        for line in value.split('\n'):
-            line = line.strip()
-            parts = line.rsplit(' ', 1)
-            if len(parts)==2 and parts[1].startswith('#'):
-                colors.append({'name': parts[0].strip(), 'value': parts[1].strip()})
-        value = colors
+        value = parse_colors(value.split('\n'))
     elif field == 'sizes':
-        sizes = []
-        for line in value.split('\n'):
-            line = line.strip()
-            parts = line.rsplit(' ', 1)
-            if len(parts)==2:
-                try: sizes.append({'label': parts[0].strip(), 'priceDelta': int(parts[1].replace('+',''))})
-                except: pass
-        value = sizes
+        value = parse_sizes(value.split('\n'))
 
-    p[field] = value
+    setattr(p, Product.FIELDS[field][0], value)
     save_products(products)
     label = EDIT_FIELDS.get(field, field)
     await update.message.reply_text(
-        f"✅ *{label}* обновлено для товара *{p['name']}*!",
+        f"✅ *{label}* обновлено для товара *{p.name}*!",
         parse_mode="Markdown",
         reply_markup=InlineKeyboardMarkup([[
             InlineKeyboardButton("✏️ Ещё изменить", callback_data=f"edit_p_{pid}"),
@@ -491,11 +705,12 @@ async def edit_photos_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pid = int(q.data.split("_")[-1])
     context.user_data['photo_edit_id'] = pid
     products = load_products()
-    p = next((x for x in products if x['id']==pid), None)
-    current = len(p.get('photos',[])) if p else 0
+    p = find_product(products, pid)
+    if not p:
+        await q.edit_message_text("⚠️ Не найден.", reply_markup=_back_admin()); return
     await q.edit_message_text(
-        f"📸 *Фото для товара {p['name']}*\n\n"
-        f"Сейчас: {current} фото\n\n"
+        f"📸 *Фото для товара {p.name}*\n\n"
+        f"Сейчас: {len(p.photos)} фото\n\n"
         "Отправьте новые фото (они заменят старые).\nКогда закончите — нажмите Готово.",
         parse_mode="Markdown",
         reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ Готово", callback_data=f"photo_edit_done_{pid}")]])
@@ -529,11 +744,11 @@ async def photo_edit_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pid = int(q.data.split("_")[-1])
     photos = context.user_data.get('photo_edit_photos', [])
     products = load_products()
-    p = next((x for x in products if x['id']==pid), None)
+    p = find_product(products, pid)
     if p and photos:
-        p['photos'] = photos
+        p.photos = photos
         save_products(products)
-        await q.edit_message_text(f"✅ Обновлено *{len(photos)} фото* для *{p['name']}*!",
+        await q.edit_message_text(f"✅ Обновлено *{len(photos)} фото* для *{p.name}*!",
                                   parse_mode="Markdown", reply_markup=_back_admin())
     else:
         await q.edit_message_text("Фото не изменены.", reply_markup=_back_admin())
@@ -552,7 +767,6 @@ async def handle_webapp_data(update: Update, context: ContextTypes.DEFAULT_TYPE)
         items, total = order.get("items",[]), order.get("total",0)
         user = update.effective_user
         oid  = f"{user.id}-{update.effective_message.message_id}"
-
         lines = "\n".join(
             f"  • {i['name']}"
             f"{' ('+i['color']+')' if i.get('color') else ''}"
@@ -588,6 +802,255 @@ async def handle_webapp_data(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
     except Exception as e:
         logger.error(f"Ошибка заказа: {e}")
+        return
+
+    # Считаем только заказы, дошедшие до админа (у них есть кнопки
+    # принять/отклонить); сбой аналитики не должен мешать самому заказу
+    try:
+        sales.record_order(oid, items, total, update.effective_message.date.astimezone())
+    except Exception as e:
+        logger.error(f"Заказ #{oid} не учтён в аналитике: {e}")
+
+# ═══════════════════════════════════════════
+#  АНАЛИТИКА ПРОДАЖ
+# ═══════════════════════════════════════════
+# Агрегаты обновляются на каждом событии заказа (O(1) на позицию).
+# Фоновая задача раз в SALES_SNAPSHOT_SEC сохраняет их в SALES_FILE,
+# последний снимок пишется при остановке — после рестарта историю
+# пересчитывать не нужно, /report читает готовые цифры.
+
+HOURS_KEPT   = 48      # почасовые корзины
+DAYS_KEPT    = 90      # дневные корзины
+PENDING_KEPT = 5000    # заказы, ждущие решения админа
+REPORT_TOP   = 5
+SPARK        = "▁▂▃▄▅▆▇█"
+
+def _bump(table: dict, key, revenue: int, units: int):
+    row = table.get(key)
+    if row is None:
+        table[key] = [revenue, units]
+    else:
+        row[0] += revenue
+        row[1] += units
+
+def _trim(table: dict, keep: int):
+    while len(table) > keep:
+        del table[min(table)]
+
+class SalesStats:
+    __slots__ = ("products", "names", "categories", "sizes", "colors", "hours", "days",
+                 "placed", "accepted", "declined", "revenue", "accepted_revenue",
+                 "pending", "dirty")
+
+    # таблицы вида ключ -> [выручка, штук/заказов]
+    TABLES = ("products", "categories", "sizes", "colors", "hours", "days")
+
+    def __init__(self):
+        self.products   = {}   # id товара -> [выручка, штук]
+        self.names      = {}   # id товара -> название из последнего заказа
+        self.categories = {}
+        self.sizes      = {}
+        self.colors     = {}
+        self.hours      = {}   # "2025-06-01 14" -> [выручка, заказов]
+        self.days       = {}   # "2025-06-01"    -> [выручка, заказов]
+        self.placed = self.accepted = self.declined = 0
+        self.revenue = self.accepted_revenue = 0
+        self.pending    = {}   # oid -> сумма заказа
+        self.dirty      = False
+
+    # ── События ──────────────────────────────
+    def record_order(self, oid: str, items: list, total: int, when: datetime):
+        # сначала разбираем все позиции, чтобы битый заказ не попал в цифры частично
+        rows = []
+        for i in items:
+            qty = int(i.get("qty", 1))
+            rows.append((i.get("id", i["name"]), i["name"], int(i["price"]) * qty, qty,
+                         i.get("size"), i.get("color")))
+        total = int(total)
+
+        for key, name, rev, qty, size, color in rows:
+            _bump(self.products, key, rev, qty)
+            self.names[key] = name
+            p = product_by_id(key)
+            if p:     _bump(self.categories, p.category, rev, qty)
+            if size:  _bump(self.sizes, size, rev, qty)
+            if color: _bump(self.colors, color, rev, qty)
+
+        hour, day = when.strftime("%Y-%m-%d %H"), when.strftime("%Y-%m-%d")
+        new_hour, new_day = hour not in self.hours, day not in self.days
+        _bump(self.hours, hour, total, 1)
+        _bump(self.days,  day,  total, 1)
+        if new_hour: _trim(self.hours, HOURS_KEPT)
+        if new_day:  _trim(self.days,  DAYS_KEPT)
+
+        self.placed  += 1
+        self.revenue += total
+        self.pending[oid] = total
+        if len(self.pending) > PENDING_KEPT:
+            del self.pending[next(iter(self.pending))]
+        self.dirty = True
+
+    def record_outcome(self, oid: str, accepted: bool):
+        total = self.pending.pop(oid, None)
+        if total is None:
+            return  # уже обработан или старше истории
+        if accepted:
+            self.accepted += 1
+            self.accepted_revenue += total
+        else:
+            self.declined += 1
+        self.dirty = True
+
+    @property
+    def conversion(self):
+        decided = self.accepted + self.declined
+        return self.accepted / decided if decided else None
+
+    # ── Снимки ───────────────────────────────
+    def to_dict(self) -> dict:
+        d = {name: {str(k): v for k, v in getattr(self, name).items()} for name in self.TABLES}
+        d["names"] = {str(k): v for k, v in self.names.items()}
+        d.update(placed=self.placed, accepted=self.accepted, declined=self.declined,
+                 revenue=self.revenue, accepted_revenue=self.accepted_revenue,
+                 pending=self.pending)
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "SalesStats":
+        s = cls()
+        pid = lambda k: int(k) if k.isdigit() else k   # JSON хранит id товаров строками
+        for name in cls.TABLES:
+            conv = pid if name == "products" else str
+            setattr(s, name, {conv(k): [int(v[0]), int(v[1])] for k, v in d.get(name, {}).items()})
+        s.names = {pid(k): v for k, v in d.get("names", {}).items()}
+        for name in ("placed", "accepted", "declined", "revenue", "accepted_revenue"):
+            setattr(s, name, int(d.get(name, 0)))
+        s.pending = {str(k): int(v) for k, v in d.get("pending", {}).items()}
+        return s
+
+    @classmethod
+    def load(cls, path: str) -> "SalesStats":
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except OSError as e:
+            # загрузка идёт при импорте — недоступный снимок не должен ронять бота
+            logger.error(f"Снимок продаж {path} не читается ({e}), начинаем с нуля")
+            return cls()
+        except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+            # не затираем битый снимок — откладываем его в сторону
+            logger.error(f"Снимок продаж {path} повреждён ({e}), начинаем с нуля")
+            try:
+                shutil.move(path, path + ".bad")
+            except OSError as e:
+                logger.error(f"Не удалось отложить {path}: {e}")
+            return cls()
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self.dirty = False
+
+    def maybe_save(self, path: str):
+        if self.dirty:
+            try:
+                self.save(path)
+            except OSError as e:
+                logger.error(f"Не удалось сохранить снимок продаж: {e}")
+
+sales = SalesStats.load(SALES_FILE)
+
+def _top(table: dict, n: int, by: int = 0):
+    return heapq.nlargest(n, table.items(), key=lambda kv: kv[1][by])
+
+def _spark(values: list) -> str:
+    hi = max(values, default=0)
+    if not hi:
+        return "·" * len(values)
+    return "".join("·" if not v else SPARK[min(len(SPARK)-1, v * len(SPARK) // (hi + 1))] for v in values)
+
+def _md(v) -> str:
+    # названия, размеры и цвета приходят из web_app_data покупателя
+    return escape_markdown(str(v), version=1)
+
+def render_report(s: SalesStats, now: datetime = None) -> str:
+    now = now or datetime.now()
+    if not s.placed:
+        return "📊 *Отчёт по продажам*\n\nЗаказов пока не было."
+
+    conv = f"{s.conversion:.0%}" if s.conversion is not None else "—"
+    lines = [
+        "📊 *Отчёт по продажам*\n",
+        f"🧾 Заказов: *{s.placed}*  •  выручка *{s.revenue:,} ₽*",
+        f"💳 Средний чек: {s.revenue // s.placed:,} ₽",
+        f"✅ Принято: {s.accepted} ({s.accepted_revenue:,} ₽)  ❌ Отклонено: {s.declined}  ⏳ Ждут: {len(s.pending)}",
+        f"📈 Конверсия: *{conv}*",
+    ]
+
+    lines.append(f"\n🏆 *Топ-{REPORT_TOP} товаров:*")
+    for n, (key, (rev, units)) in enumerate(_top(s.products, REPORT_TOP), 1):
+        lines.append(f"{n}. {_md(s.names.get(key, key))} — {rev:,} ₽ ({units} шт.)")
+
+    if s.categories:
+        lines.append("\n🏷 *Категории:*")
+        for cat, (rev, units) in _top(s.categories, len(CATEGORIES)):
+            lines.append(f"   {_md(CATEGORIES.get(cat, cat))} — {rev:,} ₽ ({units} шт.)")
+    if s.sizes:
+        lines.append("📐 *Размеры:* " + ", ".join(f"{_md(k)} ({u})" for k, (_, u) in _top(s.sizes, REPORT_TOP, by=1)))
+    if s.colors:
+        lines.append("🎨 *Цвета:* " + ", ".join(f"{_md(k)} ({u})" for k, (_, u) in _top(s.colors, REPORT_TOP, by=1)))
+
+    days = [(now - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6, -1, -1)]
+    day_rev = [s.days.get(d, (0, 0))[0] for d in days]
+    lines.append("\n📅 *7 дней:*")
+    for d, rev in zip(days, day_rev):
+        lines.append(f"`{d[8:10]}.{d[5:7]}` {rev:,} ₽  ({s.days.get(d, (0, 0))[1]} зак.)")
+    # день ещё не закончился — сравниваем с теми же часами вчера
+    hours_so_far = range(now.hour + 1)
+    today_key, yday_key = days[-1], days[-2]
+    today     = sum(s.hours.get(f"{today_key} {h:02d}", (0, 0))[0] for h in hours_so_far)
+    yesterday = sum(s.hours.get(f"{yday_key} {h:02d}", (0, 0))[0] for h in hours_so_far)
+    if yesterday:
+        lines.append(f"Сегодня к вчера (до {now.hour:02d}:59): {(today - yesterday) / yesterday:+.0%}")
+
+    hours = [(now - timedelta(hours=i)).strftime("%Y-%m-%d %H") for i in range(23, -1, -1)]
+    lines.append(f"\n🕐 *24 часа:* `{_spark([s.hours.get(h, (0, 0))[0] for h in hours])}`")
+    return "\n".join(lines)
+
+async def report_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update):
+        await update.message.reply_text("⛔ Нет доступа.")
+        return
+    await update.message.reply_text(render_report(sales), parse_mode="Markdown", reply_markup=_back_admin())
+
+_snapshot_task = None
+
+async def _sales_snapshots():
+    while True:
+        await asyncio.sleep(SALES_SNAPSHOT_SEC)
+        sales.maybe_save(SALES_FILE)
+
+async def _start_sales_snapshots(app: Application):
+    global _snapshot_task
+    _snapshot_task = asyncio.create_task(_sales_snapshots())
+
+async def _flush_sales(app: Application):
+    if _snapshot_task:
+        _snapshot_task.cancel()
+    sales.maybe_save(SALES_FILE)
+
+def _chain_hook(first, second):
+    """post_init/post_shutdown из переданного builder'а не теряются"""
+    if first is None:
+        return second
+    async def hook(app: Application):
+        await first(app)
+        await second(app)
+    return hook
 
 # ═══════════════════════════════════════════
 #  КОЛБЭКИ
@@ -601,6 +1064,10 @@ async def handle_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not is_admin(update): await q.edit_message_text("⛔ Нет доступа."); return
         await admin_panel(update, context)
 
+    elif d == "admin_report":
+        if not is_admin(update): await q.edit_message_text("⛔ Нет доступа."); return
+        await q.edit_message_text(render_report(sales), parse_mode="Markdown", reply_markup=_back_admin())
+
     elif d == "back_start":
         products = load_products()
         kb = [[InlineKeyboardButton("🛍 Открыть магазин", web_app=WebAppInfo(url=WEBAPP_URL))],
@@ -625,6 +1092,7 @@ async def handle_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif d.startswith("ord_accept_"):
         _, _, cid, oid = d.split("_", 3)
+        sales.record_outcome(oid, accepted=True)
         await context.bot.send_message(int(cid),
             f"🎉 *Заказ #{oid} подтверждён!*\nМенеджер свяжется с вами в течение 30 минут.", parse_mode="Markdown")
         await q.edit_message_reply_markup(None)
@@ -632,6 +1100,7 @@ async def handle_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif d.startswith("ord_decline_"):
         _, _, cid, oid = d.split("_", 3)
+        sales.record_outcome(oid, accepted=False)
         await context.bot.send_message(int(cid),
             f"😔 *Заказ #{oid} отклонён.*\nПожалуйста, свяжитесь с нами.", parse_mode="Markdown")
         await q.edit_message_reply_markup(None)
@@ -647,12 +1116,41 @@ async def handle_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
 def _back_admin():
     return InlineKeyboardMarkup([[InlineKeyboardButton("⚙️ Админ-панель", callback_data="admin_panel")]])
 
+_updates_log = None  # открытый UPDATES_LOG_FILE, см. build_app()
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Дописывает апдейт как есть в UPDATES_LOG_FILE (одна строка JSON)"""
+    global _updates_log
+    if _updates_log is None:
+        return
+    try:
+        _updates_log.write(update.to_json() + "\n")
+    except OSError as e:
+        logger.error(f"Запись апдейтов отключена: {e}")
+        _updates_log = None
+
 # ═══════════════════════════════════════════
 #  ЗАПУСК
 # ═══════════════════════════════════════════
 
-def main():
-    app = Application.builder().token(BOT_TOKEN).build()
+def build_app(builder=None) -> Application:
+    """Собирает Application со всеми хэндлерами; replay.py передаёт свой builder"""
+    if builder is None:
+        builder = Application.builder().token(BOT_TOKEN)
+    app = builder.build()
+    # хуки вызываются из run_polling(); свои хуки вызывающего сохраняем
+    app.post_init     = _chain_hook(app.post_init, _start_sales_snapshots)
+    app.post_shutdown = _chain_hook(app.post_shutdown, _flush_sales)
+
+    global _updates_log
+    if UPDATES_LOG_FILE and _updates_log is None:
+        try:
+            _updates_log = open(UPDATES_LOG_FILE, "a", encoding="utf-8", buffering=1)
+        except OSError as e:
+            logger.error(f"Не удалось открыть {UPDATES_LOG_FILE}, запись апдейтов выключена: {e}")
+    if _updates_log is not None:
+        # группа -1 выполняется раньше остальных и не мешает им
+        app.add_handler(TypeHandler(Update, record_update), group=-1)
 
     # ConversationHandler — добавление товара
     add_conv = ConversationHandler(
@@ -688,6 +1186,7 @@ def main():
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("admin", admin_cmd))
+    app.add_handler(CommandHandler("report", report_cmd))
     app.add_handler(CommandHandler("cancel", cancel))
 
     app.add_handler(add_conv)
@@ -703,7 +1202,10 @@ def main():
     app.add_handler(MessageHandler(filters.PHOTO, photo_edit_receive))
     app.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, handle_webapp_data))
     app.add_handler(CallbackQueryHandler(handle_cb))
+    return app
 
+def main():
+    app = build_app()
     logger.info("🪁 KITESTORE бот запущен")
     app.run_polling(allowed_updates=Update.ALL_TYPES)
 
@@ -0,0 +1,345 @@
+"""
+KITESTORE — нагрузочный прогон бота без живого Telegram.
+
+Поднимает локальную заглушку Bot API (sendMessage, editMessageText,
+getFile и т.п.), собирает Application через bot.build_app() и подаёт в
+него записанные (UPDATES_LOG_FILE) или синтетические апдейты с заданной
+скоростью. В конце печатает updates/sec, перцентили задержек и ошибки.
+
+Каталог копируется во временную папку — products.json и photos/ в
+репозитории не трогаются.
+
+python replay.py --count 5000 --rate 200 --admin-share 0.1
+python replay.py --input updates.jsonl --rate 0
+"""
+
+import argparse, asyncio, json, logging, os, random, shutil, sys, tempfile, time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import parse_qs
+
+# ═══════════════════════════════════════════
+#  ЗАГЛУШКА BOT API
+# ═══════════════════════════════════════════
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "KITESTORE", "username": "kitestore_replay_bot"}
+
+class StubBotAPI:
+    """Минимальный HTTP/1.1 сервер, отвечающий как api.telegram.org"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls   = Counter()
+        self._mid    = 0
+        self._server = None
+        self.port    = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    @property
+    def base_file_url(self):
+        return f"http://127.0.0.1:{self.port}/file/bot"
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                _, path, _ = lines[0].split(" ", 2)
+                headers = {k.strip().lower(): v.strip() for k, v in
+                           (l.split(":", 1) for l in lines[1:] if ":" in l)}
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if path.startswith("/file/"):
+                    self.calls["download"] += 1
+                    status, ctype, payload = 200, "image/jpeg", b"\xff\xd8\xff\xd9"
+                else:
+                    method = path.rsplit("/", 1)[-1]
+                    self.calls[method] += 1
+                    params = {}
+                    if headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+                        params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                    result = self._result(method, params)
+                    status, ctype = 200, "application/json"
+                    payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: {ctype}\r\n"
+                    f"Content-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def _result(self, method: str, params: dict):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getFile":
+            fid = params.get("file_id", "file")
+            return {"file_id": fid, "file_unique_id": fid, "file_size": 4, "file_path": f"photos/{fid}.jpg"}
+        if method in ("sendMessage", "editMessageText", "editMessageReplyMarkup"):
+            self._mid += 1
+            chat_id = int(params.get("chat_id") or 0)
+            return {
+                "message_id": int(params.get("message_id") or self._mid),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        # answerCallbackQuery и прочее — Telegram отвечает True
+        return True
+
+# ═══════════════════════════════════════════
+#  СИНТЕТИЧЕСКИЙ ТРАФИК
+# ═══════════════════════════════════════════
+
+class TrafficGen:
+    """Поток апдейтов: покупатели листают меню и оформляют заказы,
+    админ открывает панель, списки и отчёт, правит цены и фото, разбирает заказы"""
+
+    def __init__(self, admin_id: int, products: list, admin_share: float, seed: int):
+        self.rnd         = random.Random(seed)
+        self.admin       = {"id": admin_id, "is_bot": False, "first_name": "Admin", "username": "admin"}
+        self.products    = products
+        self.admin_share = admin_share
+        self.uid         = 0
+        self.mid         = 0
+        self.orders      = []
+
+    def stream(self, count: int):
+        n = 0
+        while n < count:
+            if self.rnd.random() < self.admin_share:
+                session = self._admin_session()
+            else:
+                session = self._customer_session()
+            for upd in session:
+                if n == count: return
+                n += 1
+                yield upd
+
+    # ── Конструкторы апдейтов ────────────────
+    def _update(self, **payload) -> dict:
+        self.uid += 1
+        return {"update_id": self.uid, **payload}
+
+    def _msg(self, user, text=None, **extra) -> dict:
+        self.mid += 1
+        m = {"message_id": self.mid, "date": int(time.time()),
+             "chat": {"id": user["id"], "type": "private"}, "from": user, **extra}
+        if text is not None:
+            m["text"] = text
+            if text.startswith("/"):
+                m["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return m
+
+    def _command(self, user, text):
+        return self._update(message=self._msg(user, text))
+
+    def _text(self, user, text):
+        return self._update(message=self._msg(user, text))
+
+    def _callback(self, user, data, chat_id=None):
+        msg = self._msg(BOT_USER, "…")
+        msg["chat"] = {"id": chat_id or user["id"], "type": "private"}
+        return self._update(callback_query={
+            "id": str(self.uid + 1), "from": user, "chat_instance": "replay",
+            "data": data, "message": msg,
+        })
+
+    # ── Сессии ───────────────────────────────
+    def _customer_session(self):
+        cid  = 10_000 + self.rnd.randrange(50_000)
+        user = {"id": cid, "is_bot": False, "first_name": f"Buyer{cid}"}
+        yield self._command(user, "/start")
+        for data in self.rnd.sample(["about", "my_orders", "back_start"], k=self.rnd.randint(0, 3)):
+            yield self._callback(user, data)
+        if self.products and self.rnd.random() < 0.5:
+            items = []
+            for p in self.rnd.sample(self.products, k=min(len(self.products), self.rnd.randint(1, 3))):
+                item = {"id": p.id, "name": p.name, "qty": self.rnd.randint(1, 2), "price": p.base_price}
+                if p.sizes:  item["size"]  = self.rnd.choice(p.sizes).label
+                if p.colors: item["color"] = self.rnd.choice(p.colors).name
+                items.append(item)
+            order = {"items": items, "total": sum(i["price"] * i["qty"] for i in items)}
+            msg = self._msg(user, web_app_data={"data": json.dumps(order, ensure_ascii=False),
+                                                "button_text": "🛍 Открыть магазин"})
+            self.orders.append((cid, f"{cid}-{msg['message_id']}"))
+            yield self._update(message=msg)
+
+    def _admin_session(self):
+        a = self.admin
+        yield self._command(a, self.rnd.choice(["/admin", "/admin", "/report"]))
+        kind = self.rnd.random()
+        if kind < 0.4:
+            pages = max(1, -(-len(self.products) // 5))
+            yield self._callback(a, f"admin_list_{self.rnd.randrange(pages)}")
+        elif kind < 0.6 and self.products:
+            p = self.rnd.choice(self.products)
+            yield self._callback(a, "admin_edit_choose")
+            yield self._callback(a, f"edit_p_{p.id}")
+            yield self._callback(a, "ef_price")
+            yield self._text(a, f"{p.price:,}".replace(",", " "))
+        elif kind < 0.7 and self.products:
+            p = self.rnd.choice(self.products)
+            yield self._callback(a, f"edit_photos_{p.id}")
+            fid = f"replay{self.mid}"
+            yield self._update(message=self._msg(a, photo=[
+                {"file_id": fid, "file_unique_id": fid, "width": 800, "height": 600}]))
+            yield self._callback(a, f"photo_edit_done_{p.id}")
+        elif self.orders:
+            cid, oid = self.orders.pop(self.rnd.randrange(len(self.orders)))
+            verdict = self.rnd.choice(["accept", "decline"])
+            yield self._callback(a, f"ord_{verdict}_{cid}_{oid}")
+        else:
+            yield self._callback(a, "admin_del_choose")
+        if self.rnd.random() < 0.3:
+            yield self._callback(a, "admin_report")
+        yield self._callback(a, "admin_panel")
+
+def load_recorded(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+# ═══════════════════════════════════════════
+#  ПРОГОН И ОТЧЁТ
+# ═══════════════════════════════════════════
+
+def percentile(sorted_vals: list, pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, round(pct / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+async def replay(args, bot_module):
+    from telegram import Update
+    from telegram.ext import Application
+
+    api = StubBotAPI(latency=args.api_latency / 1000)
+    await api.start()
+
+    builder = (Application.builder().token(bot_module.BOT_TOKEN)
+               .base_url(api.base_url).base_file_url(api.base_file_url)
+               .connection_pool_size(max(8, args.workers * 4)))
+    app = bot_module.build_app(builder)
+
+    errors = Counter()
+    async def on_error(update, context):
+        errors[type(context.error).__name__] += 1
+        if args.verbose:
+            logging.getLogger("replay").exception("handler error", exc_info=context.error)
+    app.add_error_handler(on_error)
+
+    if args.input:
+        raw = list(load_recorded(args.input))
+    else:
+        gen = TrafficGen(bot_module.ADMIN_CHAT_ID, bot_module.load_products(),
+                         args.admin_share, args.seed)
+        raw = list(gen.stream(args.count))
+    kinds = Counter()
+    handler_lat, e2e_lat = [], []
+    queue = asyncio.Queue(maxsize=args.workers * 64)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            update, scheduled = item
+            t = time.perf_counter()
+            try:
+                await app.process_update(update)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            done = time.perf_counter()
+            handler_lat.append(done - t)
+            e2e_lat.append(done - scheduled)
+
+    async with app:
+        workers = [asyncio.create_task(worker()) for _ in range(args.workers)]
+        t0 = time.perf_counter()
+        for i, data in enumerate(raw):
+            if args.rate:
+                delay = t0 + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            update = Update.de_json(data, app.bot)
+            kinds["callback" if update.callback_query else
+                  "webapp"   if update.message and update.message.web_app_data else
+                  "command"  if update.message and (update.message.text or "").startswith("/") else
+                  "message"] += 1
+            await queue.put((update, t0 + i / args.rate if args.rate else time.perf_counter()))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - t0
+
+    await api.stop()
+
+    handler_lat.sort(); e2e_lat.sort()
+    ms = lambda v: f"{v * 1000:8.2f}"
+    print(f"\n🪁 Replay: {len(raw)} апдейтов за {elapsed:.2f} с  →  {len(raw) / elapsed:.1f} updates/sec")
+    print("   состав: " + ", ".join(f"{k} {v}" for k, v in kinds.most_common()))
+    print(f"   {'':10}{'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)")
+    for name, vals in (("handler", handler_lat), ("end2end", e2e_lat)):
+        print(f"   {name:10}" + " ".join(ms(percentile(vals, p)) for p in (50, 90, 99, 100)))
+    print(f"   ошибок: {sum(errors.values())}" + (f"  ({dict(errors)})" if errors else ""))
+    print("   Bot API: " + ", ".join(f"{k} {v}" for k, v in api.calls.most_common()))
+    return sum(errors.values())
+
+def main():
+    ap = argparse.ArgumentParser(description="Нагрузочный прогон KITESTORE-бота на заглушке Bot API")
+    ap.add_argument("--input",       help="JSONL с записанными апдейтами (UPDATES_LOG_FILE); без него — синтетика")
+    ap.add_argument("--count",       type=int,   default=1000, help="сколько синтетических апдейтов")
+    ap.add_argument("--rate",        type=float, default=0,    help="апдейтов в секунду (0 — без ограничения)")
+    ap.add_argument("--workers",     type=int,   default=1,    help="параллельная обработка (1 — как run_polling)")
+    ap.add_argument("--admin-share", type=float, default=0.1,  help="доля админских сессий в синтетике")
+    ap.add_argument("--api-latency", type=float, default=0,    help="задержка ответа заглушки, мс")
+    ap.add_argument("--catalog",     default="products.json",  help="каталог, копируется во временную папку")
+    ap.add_argument("--seed",        type=int,   default=1)
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args()
+
+    if args.input:
+        args.input = os.path.abspath(args.input)
+    catalog = os.path.abspath(args.catalog)
+    cwd = os.getcwd()
+
+    # bot.py работает с products.json и photos/ относительно cwd —
+    # уходим во временную папку до импорта
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    workdir = tempfile.mkdtemp(prefix="kitestore_replay_")
+    if os.path.exists(catalog):
+        shutil.copy(catalog, os.path.join(workdir, "products.json"))
+    os.environ.setdefault("BOT_TOKEN", "123456:REPLAY")
+    os.environ.pop("UPDATES_LOG_FILE", None)
+    os.chdir(workdir)
+    try:
+        import bot
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        failed = asyncio.run(replay(args, bot))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()